@@ -18,8 +18,7 @@ CREATE TABLE IF NOT EXISTS observations (
     num_identification_disagreements INTEGER,
     license TEXT,
     raw_data JSONB,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UNIQUE(observation_id)
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Labels table: stores annotations from Label Studio
@@ -0,0 +1,26 @@
+"""
+Shared configuration for the ingestion scripts
+"""
+
+import os
+import functools
+from dotenv import load_dotenv
+from psycopg2.pool import ThreadedConnectionPool
+
+# Load environment variables
+load_dotenv()
+
+# Database configuration
+DB_CONFIG = {
+    'dbname': os.getenv('POSTGRES_DB', 'postgres'),
+    'user': os.getenv('POSTGRES_USER', 'postgres'),
+    'password': os.getenv('POSTGRES_PASSWORD', 'postgres'),
+    'host': os.getenv('POSTGRES_HOST', 'localhost'),
+    'port': os.getenv('POSTGRES_PORT', '5432')
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_pool():
+    """Return the shared database connection pool, creating it on first use."""
+    return ThreadedConnectionPool(1, 10, **DB_CONFIG)
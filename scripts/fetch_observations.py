@@ -6,19 +6,23 @@ This script fetches random monarch butterfly observations from iNaturalist,
 downloads their images, and stores metadata in PostgreSQL. No Label Studio integration.
 """
 
+import io
 import os
+import re
+import json
+import time
 import random
+import shutil
 import requests
 import logging
 import argparse
 import psycopg2
 import psycopg2.extras
 from pathlib import Path
-from dotenv import load_dotenv
-from psycopg2.extras import RealDictCursor
-
-# Load environment variables
-load_dotenv()
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from _config import get_pool
 
 # Configuration
 INAT_API_URL = "https://api.inaturalist.org/v1/observations"
@@ -26,15 +30,10 @@ MONARCH_TAXON_ID = 48662
 # Resolve paths relative to the project root (one level up from this script)
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 IMAGE_DIR = PROJECT_ROOT / "data" / "images"
-
-# Database configuration
-DB_CONFIG = {
-    'dbname': os.getenv('POSTGRES_DB', 'labelstudio'),
-    'user': os.getenv('POSTGRES_USER', 'postgres'),
-    'password': os.getenv('POSTGRES_PASSWORD', 'postgres'),
-    'host': os.getenv('POSTGRES_HOST', 'localhost'),
-    'port': os.getenv('POSTGRES_PORT', '5432')
-}
+# Cached (ETag, total_results) from the last count probe
+TOTAL_CACHE_PATH = PROJECT_ROOT / "data" / "inat_total.json"
+# The total barely moves, so a cached count younger than this skips the probe entirely
+TOTAL_CACHE_TTL = 3600
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -42,88 +41,349 @@ logger = logging.getLogger(__name__)
 
 # Ensure directories exist
 IMAGE_DIR.mkdir(parents=True, exist_ok=True)
+# Plain string form used to build per-image paths on the download hot path
+IMAGE_DIR_STR = str(IMAGE_DIR)
+
+# Shared HTTP session so connections to the API and photo CDN are reused
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=20,
+    max_retries=Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
+
+INSERT_COLUMNS = (
+    'observation_id', 'inat_url', 'observed_on', 'observer_login', 'observer_name',
+    'latitude', 'longitude', 'location', 'image_url', 'image_local_path',
+    'quality_grade', 'num_identification_agreements', 'num_identification_disagreements',
+    'license', 'raw_data',
+)
+
+INSERT_SQL = f"""
+    INSERT INTO observations ({', '.join(INSERT_COLUMNS)})
+    VALUES %s
+    ON CONFLICT (observation_id) DO NOTHING
+"""
+
+# Per-row fallback used when a whole batch fails; prepared once per connection
+PREPARE_INSERT_SQL = f"""
+    PREPARE obs_insert AS
+    INSERT INTO observations ({', '.join(INSERT_COLUMNS)})
+    VALUES ({', '.join(f'${i}' for i in range(1, len(INSERT_COLUMNS) + 1))})
+    ON CONFLICT (observation_id) DO NOTHING
+"""
+EXECUTE_INSERT_SQL = f"EXECUTE obs_insert ({', '.join(['%s'] * len(INSERT_COLUMNS))})"
+
+# Rows are flushed to the database in batches of this size. Kept small so that
+# inserts overlap with the downloads still running in the pool
+BATCH_SIZE = 100
+
+# Matches the size component of an iNaturalist photo URL, e.g. ".../photos/123/square.jpg?456"
+PHOTO_SIZE_RE = re.compile(r'square(?=\.[a-z]+(?:\?|$))', re.IGNORECASE)
+
+# Images up to this size are read fully into memory instead of streamed
+MAX_IN_MEMORY_IMAGE_BYTES = 8 * 1024 * 1024
+
+# Images advertised as larger than this are skipped without downloading the body
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+
+# Number of images downloaded in parallel
+DOWNLOAD_WORKERS = 10
+
+# Compact encoder for raw_data. The payloads are parsed API JSON, so they can't contain cycles
+JSON_ENCODER = json.JSONEncoder(separators=(',', ':'), check_circular=False)
+
+# Characters that must be escaped in COPY text format
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
 
+class FastJson(psycopg2.extras.Json):
+    """Json adapter that serializes with the shared compact encoder."""
 
-def get_db_connection():
-    """Create and return a database connection."""
+    def dumps(self, obj):
+        return JSON_ENCODER.encode(obj)
+
+
+def download_image(url, obs_id):
+    """Download an observation image. Returns the local filename or None on failure."""
+    filename = f"{obs_id}.jpg"
+    filepath = f"{IMAGE_DIR_STR}/{filename}"
+    # Reuse an image left by an earlier run (e.g. downloaded but never inserted)
+    try:
+        if os.stat(filepath).st_size > 0:
+            logger.info(f"Image for observation {obs_id} already downloaded, skipping")
+            return filename
+    except FileNotFoundError:
+        pass
+
+    # Write to a temporary file so an interrupted download is never mistaken for a complete one.
+    # The PID keeps concurrent fetch runs from writing into the same partial file
+    partial_path = f"{filepath}.{os.getpid()}.part"
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        return conn
+        with SESSION.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            # Headers arrive before the body, so unusable responses are rejected for free
+            content_type = response.headers.get('Content-Type', '')
+            content_length = int(response.headers.get('Content-Length', 0))
+            if not content_type.startswith('image/'):
+                logger.warning(f"Skipping observation {obs_id}: unexpected content type '{content_type}'")
+                return None
+            if content_length > MAX_IMAGE_BYTES:
+                logger.warning(f"Skipping observation {obs_id}: image is {content_length} bytes")
+                return None
+            if 0 < content_length <= MAX_IN_MEMORY_IMAGE_BYTES:
+                # Typical images fit comfortably in memory: write them in one call
+                with open(partial_path, 'wb') as f:
+                    f.write(response.content)
+            else:
+                # Copy straight from the socket in 1 MiB reads instead of 8 KiB Python-level chunks
+                response.raw.decode_content = True
+                with open(partial_path, 'wb') as f:
+                    shutil.copyfileobj(response.raw, f, length=1024 * 1024)
+        os.replace(partial_path, filepath)
+        return filename
     except Exception as e:
-        logger.error(f"Failed to connect to database: {e}")
-        raise
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        logger.error(f"Failed to download image for observation {obs_id}: {e}")
+        return None
+
+
+def observation_row(obs_data, image_filename):
+    """Build the observations table row for an iNaturalist observation."""
+    # Extract relevant fields from iNaturalist observation
+    location_parts = []
+    if obs_data.get('place_guess'):
+        location_parts.append(obs_data['place_guess'])
+    location = ', '.join(location_parts) if location_parts else None
+
+    # iNaturalist reports location as "lat,lon"; anything else is treated as missing
+    latitude, sep, longitude = (obs_data.get('location') or '').partition(',')
+    if not sep:
+        latitude = longitude = None
+
+    # Count current agreeing/disagreeing identifications in a single pass
+    agreements = disagreements = 0
+    for identification in obs_data.get('identifications', ()):
+        if not identification.get('current', False):
+            continue
+        category = identification.get('category')
+        agreements += category == 'improving'
+        disagreements += category == 'maverick'
+
+    return (
+        obs_data['id'],
+        obs_data.get('uri'),
+        obs_data.get('observed_on'),
+        obs_data.get('user', {}).get('login'),
+        obs_data.get('user', {}).get('name'),
+        latitude or None,
+        longitude or None,
+        location,
+        obs_data.get('photos', [{}])[0].get('url') if obs_data.get('photos') else None,
+        f"/data/images/{image_filename}",
+        obs_data.get('quality_grade'),
+        agreements,
+        disagreements,
+        obs_data.get('license_code'),
+        FastJson(obs_data)  # Store full API response as JSON
+    )
 
 
-def observation_exists(conn, obs_id):
-    """Check if an observation already exists in the database."""
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT 1 FROM observations WHERE observation_id = %s", (obs_id,))
-        return cursor.fetchone() is not None
+def has_medium_photo(obs_data):
+    """Check that the observation's first photo URL can be rewritten to the medium size."""
+    photos = obs_data.get('photos')
+    return bool(photos) and PHOTO_SIZE_RE.search(photos[0].get('url') or '') is not None
+
 
+def with_medium_photo(observations):
+    """Keep the observations that have a resizable photo URL, logging how many were dropped."""
+    kept = [obs for obs in observations if has_medium_photo(obs)]
+    if len(kept) < len(observations):
+        logger.info(f"Skipped {len(observations) - len(kept)}/{len(observations)} observations without a resizable photo URL")
+    return kept
 
-def save_observation(conn, obs_data, image_filename):
-    """Save observation metadata to the database."""
+
+def process_observation(obs_data):
+    """Download the observation's image and return its database row, or None if it failed."""
+    try:
+        photos = obs_data.get('photos')
+        if not photos:
+            logger.warning(f"Observation {obs_data['id']} has no photos, skipping")
+            return None
+
+        photo_url = PHOTO_SIZE_RE.sub('medium', photos[0]['url'], count=1)
+        image_filename = download_image(photo_url, obs_data['id'])
+        if not image_filename:
+            return None
+
+        return observation_row(obs_data, image_filename)
+    except Exception as e:
+        logger.error(f"Failed to process observation {obs_data.get('id')}: {e}")
+        return None
+
+
+def collect_rows(futures):
+    """Return the rows produced by finished download futures, logging any that raised."""
+    rows = []
+    for future in futures:
+        try:
+            row = future.result()
+        except Exception as e:
+            logger.error(f"Download task failed: {e}")
+            continue
+        if row:
+            rows.append(row)
+    return rows
+
+
+def flush_batch(conn, rows):
+    """Insert a batch of observation rows with a single statement. Returns the number of rows written."""
+    if not rows:
+        return 0
+    try:
+        with conn.cursor() as cursor:
+            psycopg2.extras.execute_values(
+                cursor,
+                INSERT_SQL,
+                rows,
+                template=f"({', '.join(['%s'] * len(INSERT_COLUMNS))})",
+                page_size=BATCH_SIZE,
+            )
+        conn.commit()
+        logger.info(f"Saved {len(rows)} observations to database")
+        return len(rows)
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Failed to save batch of {len(rows)} observations, retrying row by row: {e}")
+        return insert_rows_individually(conn, rows)
+
+
+def insert_rows_individually(conn, rows):
+    """
+    Insert rows one at a time through a prepared statement, skipping rows that fail.
+    Used after a batch insert fails so that one bad row doesn't lose the whole batch.
+    """
+    saved = 0
     try:
         with conn.cursor() as cursor:
-            # Extract relevant fields from iNaturalist observation
-            location_parts = []
-            if obs_data.get('place_guess'):
-                location_parts.append(obs_data['place_guess'])
-            location = ', '.join(location_parts) if location_parts else None
+            cursor.execute("SELECT 1 FROM pg_prepared_statements WHERE name = 'obs_insert'")
+            if cursor.fetchone() is None:
+                cursor.execute(PREPARE_INSERT_SQL)
+
+            for row in rows:
+                cursor.execute("SAVEPOINT obs_row")
+                try:
+                    cursor.execute(EXECUTE_INSERT_SQL, row)
+                    cursor.execute("RELEASE SAVEPOINT obs_row")
+                    saved += 1
+                except psycopg2.Error as e:
+                    cursor.execute("ROLLBACK TO SAVEPOINT obs_row")
+                    logger.error(f"Failed to save observation {row[0]}: {e}")
+        conn.commit()
+        logger.info(f"Saved {saved}/{len(rows)} observations to database")
+        return saved
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Failed to save observations row by row: {e}")
+        return 0
+
+
+def copy_field(value):
+    """Format a single value for COPY text format."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, psycopg2.extras.Json):
+        value = value.dumps(value.adapted)
+    return str(value).translate(COPY_ESCAPES)
+
 
+def copy_batch(conn, rows):
+    """
+    Bulk load a batch of observation rows with COPY. Returns the number of rows written.
+
+    Rows are copied into a temporary staging table and then inserted from there,
+    so that existing observations are still skipped via ON CONFLICT.
+    """
+    if not rows:
+        return 0
+    columns = ', '.join(INSERT_COLUMNS)
+    buf = io.StringIO()
+    for row in rows:
+        buf.write('\t'.join(copy_field(value) for value in row))
+        buf.write('\n')
+    buf.seek(0)
+    try:
+        with conn.cursor() as cursor:
+            # Created once per connection and emptied on every commit, so repeated flushes
+            # don't create and drop a table (catalog writes) for each batch
             cursor.execute("""
-                INSERT INTO observations (
-                    observation_id, inat_url, observed_on, observer_login, observer_name,
-                    latitude, longitude, location, image_url, image_local_path,
-                    quality_grade, num_identification_agreements, num_identification_disagreements,
-                    license, raw_data
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                CREATE TEMP TABLE IF NOT EXISTS obs_stage (LIKE observations INCLUDING DEFAULTS)
+                ON COMMIT DELETE ROWS
+            """)
+            cursor.copy_expert(f"COPY obs_stage ({columns}) FROM STDIN WITH (FORMAT text)", buf)
+            cursor.execute(f"""
+                INSERT INTO observations ({columns})
+                SELECT {columns} FROM obs_stage
                 ON CONFLICT (observation_id) DO NOTHING
-            """, (
-                obs_data['id'],
-                obs_data.get('uri'),
-                obs_data.get('observed_on'),
-                obs_data.get('user', {}).get('login'),
-                obs_data.get('user', {}).get('name'),
-                obs_data.get('location', '').split(',')[0] if obs_data.get('location') else None,  # latitude
-                obs_data.get('location', '').split(',')[1] if obs_data.get('location') and ',' in obs_data.get('location', '') else None,  # longitude
-                location,
-                obs_data.get('photos', [{}])[0].get('url') if obs_data.get('photos') else None,
-                f"/data/images/{image_filename}",
-                obs_data.get('quality_grade'),
-                len([i for i in obs_data.get('identifications', []) if i.get('current', False) and i.get('category') == 'improving']),
-                len([i for i in obs_data.get('identifications', []) if i.get('current', False) and i.get('category') == 'maverick']),
-                obs_data.get('license_code'),
-                psycopg2.extras.Json(obs_data)  # Store full API response as JSON
-            ))
-            conn.commit()
-            logger.info(f"Saved observation {obs_data['id']} to database")
-            return True
+            """)
+        conn.commit()
+        logger.info(f"Copied {len(rows)} observations to database")
+        return len(rows)
     except Exception as e:
         conn.rollback()
-        logger.error(f"Failed to save observation {obs_data.get('id')}: {e}")
-        return False
+        logger.error(f"Failed to copy batch of {len(rows)} observations, retrying row by row: {e}")
+        return insert_rows_individually(conn, rows)
+
+
+def fetch_total_results():
+    """
+    Fetch the total number of matching observations.
+    Reuses a recently cached count without a request; otherwise sends the ETag from
+    the previous probe so an unchanged count comes back as a 304.
+    """
+    params = {
+        "taxon_id": MONARCH_TAXON_ID,
+        "quality_grade": "research",
+        "without_term_id": 1,
+        "per_page": 1,
+        "only_id": "true",  # Skip the full observation body, only total_results is needed
+    }
+    try:
+        cached = json.loads(TOTAL_CACHE_PATH.read_text())
+    except (OSError, ValueError):
+        cached = {}
+    if 'total_results' in cached and time.time() - cached.get('ts', 0) < TOTAL_CACHE_TTL:
+        return cached['total_results']
+
+    headers = {"If-None-Match": cached['etag']} if cached.get('etag') else {}
+    response = SESSION.get(INAT_API_URL, params=params, headers=headers)
+    response.raise_for_status()
+    if response.status_code == 304:
+        total_results = cached['total_results']
+    else:
+        total_results = response.json()['total_results']
+
+    cache = {'etag': response.headers.get('ETag', cached.get('etag')), 'total_results': total_results, 'ts': time.time()}
+    try:
+        TOTAL_CACHE_PATH.write_text(json.dumps(cache))
+    except OSError as e:
+        logger.warning(f"Could not cache total count: {e}")
+    return total_results
 
 
-def fetch_candidates(target_count, existing_ids=set()):
+def fetch_candidates(conn, target_count):
     """
-    Fetches a pool of candidate observations.
+    Fetches a pool of candidate observations that are not yet in the database.
     Target pool size is 10x the requested count (or 200, whichever is larger).
     """
     pool_target = max(target_count * 10, 200)
-    candidates = {}  # Use dict to deduplicate by ID {id: obs}
-    
+    candidates = []
+
     # Get total count first
     try:
-        params = {
-            "taxon_id": MONARCH_TAXON_ID,
-            "quality_grade": "research",
-            "without_term_id": 1,
-            "per_page": 1,
-        }
-        response = requests.get(INAT_API_URL, params=params)
-        response.raise_for_status()
-        total_results = response.json()['total_results']
+        total_results = fetch_total_results()
         logger.info(f"Total available observations: {total_results}")
     except Exception as e:
         logger.error(f"Error fetching total count: {e}")
@@ -132,51 +392,81 @@ def fetch_candidates(target_count, existing_ids=set()):
     # If total is small, just fetch everything sequentially
     if total_results <= pool_target:
         logger.info(f"Total results ({total_results}) is small. Fetching all available...")
-        return fetch_all_available(total_results)
-
-    # Otherwise, fetch from random offsets until we have enough
-    attempts = 0
-    max_attempts = 20  # Prevent infinite loops
-    
-    # Accessible limit is usually 10k for offset-based queries
-    max_accessible = min(total_results, 10000)
-
-    while len(candidates) < pool_target and attempts < max_attempts:
-        attempts += 1
-        
-        # Pick a random offset
-        # Ensure we don't go past the end
-        page_size = 200
-        max_start = max(0, max_accessible - page_size)
-        offset = random.randint(0, max_start)
-        
-        logger.info(f"Fetching batch from offset {offset} (Pool size: {len(candidates)}/{pool_target})...")
-        
-        batch = fetch_batch(offset, page_size)
-        if not batch:
+        # Paging can repeat an observation if results shift between pages; keep one per ID
+        available = {obs['id']: obs for obs in with_medium_photo(fetch_all_available(total_results))}
+        return filter_new_observations(conn, list(available.values()))
+
+    # Don't chase a large pool when most matching observations are already stored
+    remaining = total_results - count_observations(conn)
+    pool_target = min(pool_target, max(remaining * 2, target_count))
+
+    # Otherwise, fetch from random, non-overlapping ID windows until we have enough
+    try:
+        min_id, max_id = fetch_id_range()
+    except Exception as e:
+        logger.error(f"Error fetching observation ID range: {e}")
+        return []
+
+    # Size windows so that each holds about one page of observations on average
+    page_size = 200
+    num_windows = max(1, total_results // page_size)
+    window_size = (max_id - min_id) // num_windows + 1
+    max_attempts = 20  # Prevent excessive API calls
+    min_hit_rate = 0.05  # Give up once almost everything fetched is already stored
+    fetched = 0
+
+    for window in random.sample(range(num_windows), min(num_windows, max_attempts)):
+        if len(candidates) >= pool_target:
             break
-            
-        for obs in batch:
-            # Only add if not already in our pool AND not in DB (optimization)
-            if obs['id'] not in candidates and obs['id'] not in existing_ids:
-                candidates[obs['id']] = obs
+        if fetched >= 3 * page_size and len(candidates) / fetched < min_hit_rate:
+            logger.info(f"Only {len(candidates)}/{fetched} fetched observations are new, stopping early")
+            break
+
+        id_above = min_id + window * window_size - 1
+        id_below = id_above + window_size + 1
+
+        logger.info(f"Fetching batch from IDs {id_above + 1}-{id_below - 1} (Pool size: {len(candidates)}/{pool_target})...")
 
-    return list(candidates.values())
+        # Windows don't overlap, so every observation returned is unique
+        batch = fetch_batch(id_above, id_below, page_size)
+        fetched += len(batch)
+        candidates.extend(filter_new_observations(conn, with_medium_photo(batch)))
+
+    return candidates
+
+def fetch_id_range():
+    """Return the lowest and highest matching observation IDs."""
+    ids = []
+    for order in ("asc", "desc"):
+        params = {
+            "taxon_id": MONARCH_TAXON_ID,
+            "quality_grade": "research",
+            "without_term_id": 1,
+            "per_page": 1,
+            "only_id": "true",
+            "order_by": "id",
+            "order": order,
+        }
+        response = SESSION.get(INAT_API_URL, params=params)
+        response.raise_for_status()
+        ids.append(response.json()['results'][0]['id'])
+    return ids[0], ids[1]
 
-def fetch_batch(offset, limit=200):
-    """Fetch a single batch of observations."""
+def fetch_batch(id_above, id_below, limit=200):
+    """Fetch a single batch of observations with IDs strictly between id_above and id_below."""
     params = {
         "taxon_id": MONARCH_TAXON_ID,
         "quality_grade": "research",
         "without_term_id": 1,
         "photos": "true",
         "per_page": limit,
-        "offset": offset,
-        "order_by": "observed_on",
-        "order": "desc",
+        "id_above": id_above,
+        "id_below": id_below,
+        "order_by": "id",
+        "order": "asc",
     }
     try:
-        response = requests.get(INAT_API_URL, params=params)
+        response = SESSION.get(INAT_API_URL, params=params)
         response.raise_for_status()
         return response.json().get('results', [])
     except Exception as e:
@@ -200,7 +490,7 @@ def fetch_all_available(total_limit):
             "order": "desc",
         }
         try:
-            r = requests.get(INAT_API_URL, params=params)
+            r = SESSION.get(INAT_API_URL, params=params)
             r.raise_for_status()
             batch = r.json().get('results', [])
             if not batch:
@@ -212,11 +502,26 @@ def fetch_all_available(total_limit):
             break
     return results
 
-def get_existing_ids(conn):
-    """Get set of all observation IDs currently in DB."""
+def count_observations(conn):
+    """Return the number of observations currently in the database."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM observations")
+        return cursor.fetchone()[0]
+
+def filter_new_observations(conn, observations):
+    """Return the observations whose IDs are not already in the database."""
+    if not observations:
+        return []
+    # Anti-join against the primary key index so the DB does the set difference
     with conn.cursor() as cursor:
-        cursor.execute("SELECT observation_id FROM observations")
-        return {row[0] for row in cursor.fetchall()}
+        cursor.execute("""
+            SELECT c.id
+            FROM unnest(%s::bigint[]) AS c(id)
+            LEFT JOIN observations o ON o.observation_id = c.id
+            WHERE o.observation_id IS NULL
+        """, ([obs['id'] for obs in observations],))
+        new_ids = {row[0] for row in cursor.fetchall()}
+    return [obs for obs in observations if obs['id'] in new_ids]
 
 def main():
     parser = argparse.ArgumentParser(
@@ -234,47 +539,68 @@ def main():
         default=None,
         help='Maximum attempts (unused in new logic)'
     )
+    parser.add_argument(
+        '--copy',
+        action='store_true',
+        help='Load rows with COPY instead of INSERT (faster for large backfills)'
+    )
 
     args = parser.parse_args()
     target_count = args.num
+    flush = copy_batch if args.copy else flush_batch
 
     logger.info(f"Starting Monarch Observation Fetcher - requesting {target_count} new observations")
 
     # Connect to database
     try:
-        conn = get_db_connection()
+        pool = get_pool()
+        conn = pool.getconn()
         logger.info("Connected to PostgreSQL database")
     except Exception as e:
         logger.error(f"Cannot proceed without database connection: {e}")
         return
 
     try:
-        # 1. Get existing IDs to avoid re-fetching known ones
-        existing_ids = get_existing_ids(conn)
-        logger.info(f"Database contains {len(existing_ids)} existing observations")
-
-        # 2. Build Candidate Pool
+        # 1. Build Candidate Pool (observations already in the DB are filtered out)
         logger.info("Building candidate pool (10x target)...")
-        candidates = fetch_candidates(target_count, existing_ids)
+        candidates = fetch_candidates(conn, target_count)
         logger.info(f"Collected {len(candidates)} candidates")
 
-        # 3. Shuffle
+        # 2. Shuffle
         random.shuffle(candidates)
 
-        # 4. Process until target reached
+        # 3. Download images concurrently, inserting rows in batches as downloads finish
+        pending = iter(candidates)
+        in_flight = set()
+        rows = []
         processed_count = 0
-        for obs in candidates:
-            if processed_count >= target_count:
-                break
-            
-            # Double check existence (redundant but safe)
-            if obs['id'] in existing_ids:
-                continue
-
-            if process_observation(conn, obs):
-                processed_count += 1
-                logger.info(f"Progress: {processed_count}/{target_count} observations processed")
-                existing_ids.add(obs['id'])
+        executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS)
+        try:
+            while True:
+                # Keep the pool busy, but don't download more than the target needs
+                while (len(in_flight) < DOWNLOAD_WORKERS * 2
+                       and processed_count + len(rows) + len(in_flight) < target_count):
+                    obs = next(pending, None)
+                    if obs is None:
+                        break
+                    in_flight.add(executor.submit(process_observation, obs))
+                if not in_flight:
+                    break
+
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                rows.extend(collect_rows(done))
+
+                # Insert while the remaining downloads keep running in the pool
+                if len(rows) >= BATCH_SIZE:
+                    processed_count += flush(conn, rows)
+                    rows = []
+                    logger.info(f"Progress: {processed_count}/{target_count} observations processed")
+        finally:
+            # On Ctrl-C or an unexpected error, drop queued downloads but let running ones
+            # finish, then save every row that was downloaded so no image is left orphaned
+            executor.shutdown(wait=True, cancel_futures=True)
+            rows.extend(collect_rows(future for future in in_flight if not future.cancelled()))
+            processed_count += flush(conn, rows)
 
         logger.info(f"Completed: {processed_count} new observations added to database")
 
@@ -283,7 +609,8 @@ def main():
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
     finally:
-        conn.close()
+        pool.putconn(conn)
+        pool.closeall()
         logger.info("Database connection closed")
 
 
@@ -2,18 +2,11 @@
 """
 Database initialization script - runs automatically on container startup
 """
-import os
 import time
+import random
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-
-DB_CONFIG = {
-    'dbname': os.getenv('POSTGRES_DB', 'postgres'),
-    'user': os.getenv('POSTGRES_USER', 'postgres'),
-    'password': os.getenv('POSTGRES_PASSWORD', 'postgres'),
-    'host': os.getenv('POSTGRES_HOST', 'localhost'),
-    'port': os.getenv('POSTGRES_PORT', '5432')
-}
+from _config import DB_CONFIG
 
 SCHEMA_SQL = """
 CREATE TABLE IF NOT EXISTS observations (
@@ -32,10 +25,12 @@ CREATE TABLE IF NOT EXISTS observations (
     num_identification_disagreements INTEGER,
     license TEXT,
     raw_data JSONB,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UNIQUE(observation_id)
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Migrations for databases created by older versions of this schema
+ALTER TABLE observations ADD COLUMN IF NOT EXISTS raw_data JSONB;
+
 CREATE TABLE IF NOT EXISTS labels (
     label_id SERIAL PRIMARY KEY,
     observation_id BIGINT NOT NULL,
@@ -71,22 +66,27 @@ FROM observations o
 LEFT JOIN labels l ON o.observation_id = l.observation_id;
 """
 
-def wait_for_db(max_attempts=30):
+def wait_for_db(timeout=60):
     """Wait for database to be ready"""
-    for attempt in range(max_attempts):
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    while True:
+        attempt += 1
         try:
             conn = psycopg2.connect(**DB_CONFIG)
             conn.close()
             print("✓ Database is ready")
             return True
         except psycopg2.OperationalError:
-            if attempt < max_attempts - 1:
-                print(f"Waiting for database... ({attempt + 1}/{max_attempts})")
-                time.sleep(2)
-            else:
-                print("✗ Database not available after max attempts")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"✗ Database not available after {timeout}s")
                 return False
-    return False
+            # Exponential backoff with jitter: retry quickly at first, capped at 10s and
+            # never sleeping past the deadline (same ~60s budget as the old fixed 2s x 30 loop)
+            delay = min(10, 0.5 * 2 ** (attempt - 1), remaining) + random.uniform(0, 0.5)
+            print(f"Waiting for database... (attempt {attempt}, retrying in {delay:.1f}s)")
+            time.sleep(delay)
 
 def init_schema():
     """Initialize database schema or migrate if needed"""
@@ -95,34 +95,10 @@ def init_schema():
         conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
         cursor = conn.cursor()
 
-        # Check if observations table exists
-        cursor.execute("""
-            SELECT EXISTS (
-                SELECT FROM information_schema.tables
-                WHERE table_name = 'observations'
-            );
-        """)
-        exists = cursor.fetchone()[0]
-
-        if not exists:
-            print("Creating database schema...")
-            cursor.execute(SCHEMA_SQL)
-            print("✓ Database schema created successfully")
-        else:
-            print("✓ Observations table exists")
-            
-            # Check for raw_data column and add if missing
-            cursor.execute("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name='observations' AND column_name='raw_data';
-            """)
-            if not cursor.fetchone():
-                print("Migrating schema: Adding raw_data column...")
-                cursor.execute("ALTER TABLE observations ADD COLUMN raw_data JSONB;")
-                print("✓ Added raw_data column")
-            else:
-                print("✓ Schema is up to date")
+        # Every statement is idempotent, so the whole schema is applied in one round trip
+        print("Applying database schema...")
+        cursor.execute(SCHEMA_SQL)
+        print("✓ Database schema is up to date")
 
         cursor.close()
         conn.close()
@@ -10,19 +10,7 @@ Use this to start fresh.
 import os
 import psycopg2
 from pathlib import Path
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# Database configuration
-DB_CONFIG = {
-    'dbname': os.getenv('POSTGRES_DB', 'postgres'),
-    'user': os.getenv('POSTGRES_USER', 'postgres'),
-    'password': os.getenv('POSTGRES_PASSWORD', 'postgres'),
-    'host': os.getenv('POSTGRES_HOST', 'localhost'),
-    'port': os.getenv('POSTGRES_PORT', '5432')
-}
+from _config import DB_CONFIG
 
 def main():
     print("⚠️  WARNING: This will delete ALL observations and labels data!")
@@ -44,13 +32,8 @@ def main():
 
         print("\nDeleting all data from observations, labels, and Label Studio tasks...")
 
-        # Delete in order (respecting foreign keys)
-        cursor.execute("TRUNCATE TABLE labels CASCADE")
-        cursor.execute("TRUNCATE TABLE observations CASCADE")
-
-        # Also clear Label Studio tasks and annotations
-        cursor.execute("TRUNCATE TABLE task_completion CASCADE")
-        cursor.execute("TRUNCATE TABLE task CASCADE")
+        # Clear our tables and Label Studio's tasks/annotations in one statement
+        cursor.execute("TRUNCATE TABLE labels, observations, task_completion, task CASCADE")
 
         conn.commit()
 
@@ -69,10 +52,16 @@ def main():
         image_dir = project_root / "data" / "images"
         print(f"\nDeleting images from {image_dir}...")
         if image_dir.exists():
+            # Keep the directory itself: it is bind-mounted into the Label Studio container
             deleted_count = 0
-            for image_file in image_dir.glob("*.jpg"):
-                image_file.unlink()
-                deleted_count += 1
+            with os.scandir(image_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".jpg"):
+                        os.unlink(entry.path)
+                        deleted_count += 1
+                    elif entry.name.endswith(".part"):
+                        # Leftover partial downloads
+                        os.unlink(entry.path)
             print(f"✓ Deleted {deleted_count} image files")
         else:
             print("  - No images directory found")